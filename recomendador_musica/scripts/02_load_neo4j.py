@@ -4,63 +4,344 @@ GRAFO EXTENDIDO:
     (:Song)-[:BY_ARTIST]->(:Artist)
     (:Song)-[:IN_GENRE]->(:Genre)
     (:Artist)-[:PLAYS_GENRE]->(:Genre)
+
+Modos de carga:
+    (por defecto)  UNWIND por lotes vía Bolt
+    --apoc         UNWIND dentro de apoc.periodic.iterate (carga incremental)
+    --bulk         exporta CSVs para neo4j-admin database import (carga inicial)
 """
 
-from neo4j import GraphDatabase
-from pymongo import MongoClient
-from config import NEO4J_CONFIG, MONGODB_CONFIG
-from math import isnan
+import argparse
+import csv
+import sys
+
+from tqdm import tqdm
+
+from config import NEO4J_CONFIG, MONGODB_CONFIG, PATHS, get_mongo_client, get_neo4j_driver
+
+BATCH_SIZE = 10_000
+# Lotes enviados por transacción antes de hacer commit
+BATCHES_PER_TX = 10
+
+# Documentos por viaje del cursor de MongoDB (por defecto: 101 el primero)
+MONGO_BATCH_SIZE = 5000
 
-BATCH_SIZE = 500
+# Intervalo de refresco de la barra de progreso (más lento si no hay terminal)
+PROGRESS_INTERVAL = 1 if sys.stderr.isatty() else 5
 
+# Filas planas {track_id, track_name, popularity, artist, genre} listas para el UNWIND:
+# Mongo filtra vacíos, separa artistas y recorta espacios ($trim), evitando
+# limpiar o descartar documentos en Python.
+# El dataset repite un track_id en varios géneros (con popularidades que pueden
+# diferir): se agrupa por track_id para que todas sus filas lleven los mismos
+# track_name y popularidad (la mayor), y una recarga sobrescriba los valores.
+SONG_ROWS_PIPELINE = [
+    {"$match": {
+        "track_id": {"$nin": [None, ""]},
+        "track_genre": {"$nin": [None, ""]},
+        "artist_list": {"$ne": []}
+    }},
+    {"$group": {
+        "_id": {"$trim": {"input": "$track_id"}},
+        # $max da un valor determinista aunque el nombre difiera entre filas
+        "track_name": {"$max": "$track_name"},
+        "popularity": {"$max": "$popularity"},
+        "genres": {"$addToSet": "$track_genre"},
+        "artist_list": {"$first": "$artist_list"}
+    }},
+    {"$unwind": "$genres"},
+    {"$unwind": "$artist_list"},
+    {"$project": {
+        "_id": 0,
+        "track_id": "$_id",
+        "track_name": {"$trim": {"input": "$track_name"}},
+        "popularity": 1,
+        "genre": {"$trim": {"input": "$genres"}},
+        "artist": {"$trim": {"input": "$artist_list"}}
+    }},
+    # Descarta valores que quedaron vacíos tras el $trim
+    {"$match": {
+        "track_id": {"$nin": [None, ""]},
+        "genre": {"$nin": [None, ""]},
+        "artist": {"$nin": [None, ""]}
+    }},
+]
 
-def clean_value(value):
-    """Convierte NaN o None en None (evita errores con MERGE)."""
-    if value is None:
-        return None
-    try:
-        if isinstance(value, float) and isnan(value):
-            return None
-    except:
-        pass
-    value = str(value).strip()
-    return value if value else None
+# Índices únicos para que cada MERGE sea un index seek y no un label scan
+CONSTRAINTS = [
+    "CREATE CONSTRAINT song_id IF NOT EXISTS FOR (s:Song) REQUIRE s.track_id IS UNIQUE",
+    "CREATE CONSTRAINT artist_name IF NOT EXISTS FOR (a:Artist) REQUIRE a.name IS UNIQUE",
+    "CREATE CONSTRAINT genre_name IF NOT EXISTS FOR (g:Genre) REQUIRE g.name IS UNIQUE",
+]
 
 
 def connect_mongo():
-    client = MongoClient(MONGODB_CONFIG['uri'])
-    db = client[MONGODB_CONFIG['database']]
+    db = get_mongo_client()[MONGODB_CONFIG['database']]
     return db
 
 
 def connect_neo4j():
-    driver = GraphDatabase.driver(
-        NEO4J_CONFIG['uri'],
-        auth=(NEO4J_CONFIG['user'], NEO4J_CONFIG['password'])
-    )
-    return driver
+    return get_neo4j_driver()
+
+
+def create_constraints(session):
+    for statement in CONSTRAINTS:
+        session.run(statement).consume()
+
+
+# Nodos y relaciones se crean por separado: cada artista/género se mergea
+# una sola vez por lote en lugar de una vez por fila
+ARTISTS_QUERY = """
+UNWIND $artists AS name
+MERGE (:Artist {name: name})
+"""
+
+GENRES_QUERY = """
+UNWIND $genres AS name
+MERGE (:Genre {name: name})
+"""
+
+SONGS_QUERY = """
+UNWIND $songs AS row
+MERGE (song:Song {track_id: row.track_id})
+    SET song.track_name = row.track_name,
+        song.popularity = row.popularity
+"""
+
+EDGES_QUERY = """
+UNWIND $edges AS row
+MATCH (song:Song {track_id: row.track_id})
+MATCH (artist:Artist {name: row.artist})
+MATCH (genre:Genre {name: row.genre})
+
+MERGE (song)-[:BY_ARTIST]->(artist)
+MERGE (song)-[:IN_GENRE]->(genre)
+MERGE (artist)-[:PLAYS_GENRE]->(genre)
+"""
+
+
+# Misma carga, pero por fila: apoc.periodic.iterate hace el UNWIND y los commits
+APOC_ITERATE = """
+CALL apoc.periodic.iterate(
+    'UNWIND $rows AS row RETURN row',
+    $action,
+    {batchSize: $batch_size, parallel: $parallel, params: {rows: $rows}}
+)
+YIELD failedBatches, failedOperations, errorMessages
+RETURN failedBatches, failedOperations, errorMessages
+"""
+
+APOC_ARTIST_ACTION = "MERGE (:Artist {name: row})"
+
+APOC_GENRE_ACTION = "MERGE (:Genre {name: row})"
+
+APOC_SONG_ACTION = """
+MERGE (song:Song {track_id: row.track_id})
+    SET song.track_name = row.track_name,
+        song.popularity = row.popularity
+"""
+
+APOC_EDGE_ACTION = """
+MATCH (song:Song {track_id: row.track_id})
+MATCH (artist:Artist {name: row.artist})
+MATCH (genre:Genre {name: row.genre})
+MERGE (song)-[:BY_ARTIST]->(artist)
+MERGE (song)-[:IN_GENRE]->(genre)
+MERGE (artist)-[:PLAYS_GENRE]->(genre)
+"""
+
+
+def split_batch(batch):
+    """Separa un lote en artistas, géneros y canciones distintos, más las relaciones."""
+    # Ordenar por track_id mejora la localidad de los accesos al índice
+    edges = sorted(batch, key=lambda row: row["track_id"])
+
+    artists = list({row["artist"] for row in edges})
+    genres = list({row["genre"] for row in edges})
+    songs = list({
+        row["track_id"]: {
+            "track_id": row["track_id"],
+            "track_name": row.get("track_name"),
+            "popularity": row.get("popularity")
+        }
+        for row in edges
+    }.values())
+
+    return artists, genres, songs, edges
 
 
 def insert_batch(tx, batch):
-    query = """
-    UNWIND $rows AS row
-    
-    MERGE (song:Song {track_id: row.track_id})
-        SET song.track_name = row.track_name
-
-    MERGE (artist:Artist {name: row.artist})
-    
-    MERGE (genre:Genre {name: row.genre})
-
-    MERGE (song)-[:BY_ARTIST]->(artist)
-    MERGE (song)-[:IN_GENRE]->(genre)
-    MERGE (artist)-[:PLAYS_GENRE]->(genre)
+    artists, genres, songs, edges = split_batch(batch)
+
+    tx.run(ARTISTS_QUERY, artists=artists)
+    tx.run(GENRES_QUERY, genres=genres)
+    tx.run(SONGS_QUERY, songs=songs)
+    tx.run(EDGES_QUERY, edges=edges)
+
+
+def insert_batch_apoc(session, batch):
+    artists, genres, songs, edges = split_batch(batch)
+
+    # Los nodos son independientes entre sí; las relaciones comparten
+    # artistas/géneros y en paralelo provocarían deadlocks
+    steps = [
+        (APOC_ARTIST_ACTION, artists, True),
+        (APOC_GENRE_ACTION, genres, True),
+        (APOC_SONG_ACTION, songs, True),
+        (APOC_EDGE_ACTION, edges, False),
+    ]
+
+    # apoc.periodic.iterate no lanza excepción si fallan lotes internos:
+    # los reporta en su fila de resultado
+    for action, rows, parallel in steps:
+        result = session.run(
+            APOC_ITERATE,
+            action=action,
+            rows=rows,
+            batch_size=BATCH_SIZE,
+            parallel=parallel
+        ).single()
+
+        if result["failedBatches"] > 0:
+            raise RuntimeError(
+                f"apoc.periodic.iterate failed {result['failedBatches']} batch(es) "
+                f"({result['failedOperations']} operations): {result['errorMessages']}"
+            )
+
+
+def iter_song_rows(collection):
+    return collection.aggregate(SONG_ROWS_PIPELINE, batchSize=MONGO_BATCH_SIZE, allowDiskUse=True)
+
+
+def export_import_csvs(collection, output_dir):
+    """
+    Escribe los CSVs con cabeceras de neo4j-admin (songs, artists, genres y
+    una relación por archivo) y devuelve el comando de importación.
     """
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    songs = {}
+    artists = set()
+    genres = set()
+    by_artist = set()
+    in_genre = set()
+    plays_genre = set()
+
+    for row in iter_song_rows(collection):
+        songs.setdefault(row["track_id"], (row.get("track_name") or "", row.get("popularity", 0)))
+        artists.add(row["artist"])
+        genres.add(row["genre"])
+        by_artist.add((row["track_id"], row["artist"]))
+        in_genre.add((row["track_id"], row["genre"]))
+        plays_genre.add((row["artist"], row["genre"]))
+
+    files = {
+        "songs.csv": (
+            ["track_id:ID(Song)", "track_name", "popularity:int"],
+            ((track_id, name, popularity) for track_id, (name, popularity) in songs.items())
+        ),
+        "artists.csv": (["name:ID(Artist)"], ((name,) for name in artists)),
+        "genres.csv": (["name:ID(Genre)"], ((name,) for name in genres)),
+        "by_artist.csv": ([":START_ID(Song)", ":END_ID(Artist)"], by_artist),
+        "in_genre.csv": ([":START_ID(Song)", ":END_ID(Genre)"], in_genre),
+        "plays_genre.csv": ([":START_ID(Artist)", ":END_ID(Genre)"], plays_genre),
+    }
+
+    for filename, (header, rows) in files.items():
+        with open(output_dir / filename, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        print(f"✔ Wrote {output_dir / filename}")
+
+    print(f"Songs: {len(songs):,} | Artists: {len(artists):,} | Genres: {len(genres):,}")
+
+    return (
+        f"neo4j-admin database import full {NEO4J_CONFIG['database']} "
+        f"--overwrite-destination "
+        f"--nodes=Song={output_dir / 'songs.csv'} "
+        f"--nodes=Artist={output_dir / 'artists.csv'} "
+        f"--nodes=Genre={output_dir / 'genres.csv'} "
+        f"--relationships=BY_ARTIST={output_dir / 'by_artist.csv'} "
+        f"--relationships=IN_GENRE={output_dir / 'in_genre.csv'} "
+        f"--relationships=PLAYS_GENRE={output_dir / 'plays_genre.csv'}"
+    )
+
+
+def count_song_rows(collection):
+    """Número de filas que producirá SONG_ROWS_PIPELINE (total de la barra de progreso)."""
+    result = list(collection.aggregate(SONG_ROWS_PIPELINE + [{"$count": "rows"}], allowDiskUse=True))
+    return result[0]["rows"] if result else 0
+
+
+def load_with_transactions(session, collection, total_rows):
+    batch = []
+    batch_num = 1
+
+    progress = tqdm(total=total_rows, desc="Inserting", unit="row", mininterval=PROGRESS_INTERVAL)
+
+    tx = session.begin_transaction()
+
+    for row in iter_song_rows(collection):
+        batch.append(row)
+
+        if len(batch) >= BATCH_SIZE:
+            insert_batch(tx, batch)
+            progress.update(len(batch))
+            batch = []
+
+            # Commit cada BATCHES_PER_TX lotes para reducir el costo de cada commit
+            if batch_num % BATCHES_PER_TX == 0:
+                tx.commit()
+                tx = session.begin_transaction()
 
-    tx.run(query, rows=batch)
+            batch_num += 1
+
+    # Final batch
+    if batch:
+        insert_batch(tx, batch)
+        progress.update(len(batch))
+
+    tx.commit()
+    progress.close()
+
+
+def load_with_apoc(session, collection, total_rows):
+    batch = []
+
+    progress = tqdm(total=total_rows, desc="Inserting via APOC", unit="row",
+                    mininterval=PROGRESS_INTERVAL)
+
+    # apoc.periodic.iterate hace sus propios commits cada BATCH_SIZE filas
+    for row in iter_song_rows(collection):
+        batch.append(row)
+
+        if len(batch) >= BATCH_SIZE * BATCHES_PER_TX:
+            insert_batch_apoc(session, batch)
+            progress.update(len(batch))
+            batch = []
+
+    # Final batch
+    if batch:
+        insert_batch_apoc(session, batch)
+        progress.update(len(batch))
+
+    progress.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load the music graph from MongoDB into Neo4j")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--bulk", action="store_true",
+                      help="export CSVs for neo4j-admin database import (first-time load)")
+    mode.add_argument("--apoc", action="store_true",
+                      help="load through apoc.periodic.iterate (incremental load)")
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
+
     print("=" * 80)
     print("NEO4J DATA LOAD (OPTION 2 - EXTENDED GRAPH)")
     print("=" * 80)
@@ -71,56 +352,30 @@ def main():
     total_docs = collection.count_documents({})
     print(f"Total documents in MongoDB: {total_docs:,}")
 
+    if args.bulk:
+        command = export_import_csvs(collection, PATHS['results'] / 'neo4j_import')
+        print("\nStop Neo4j and run:")
+        print(f"  {command}")
+        print("\nThen start Neo4j and create the constraints:")
+        for statement in CONSTRAINTS:
+            print(f"  {statement};")
+        return
+
+    total_rows = count_song_rows(collection)
+    print(f"Song-artist rows to load: {total_rows:,}")
+
     # Connect to Neo4j
     driver = connect_neo4j()
     print("Connected to Neo4j")
 
-    cursor = collection.find({}, {
-        "track_id": 1,
-        "track_name": 1,
-        "artist_list": 1,
-        "track_genre": 1
-    })
-
-    batch = []
-    batch_num = 1
-
     with driver.session() as session:
-        for doc in cursor:
-            track_id = clean_value(doc.get("track_id"))
-            track_name = clean_value(doc.get("track_name"))
-            genre = clean_value(doc.get("track_genre"))
-
-            if not track_id or not genre:
-                continue
-
-            # Puede haber múltiples artistas por canción
-            artist_list = doc.get("artist_list", [])
-            if not artist_list:
-                continue
-
-            for artist in artist_list:
-                artist = clean_value(artist)
-                if not artist:
-                    continue
-
-                batch.append({
-                    "track_id": track_id,
-                    "track_name": track_name,
-                    "artist": artist,
-                    "genre": genre
-                })
-
-            if len(batch) >= BATCH_SIZE:
-                print(f"✔ Inserting batch {batch_num} ({len(batch)} rows)")
-                session.execute_write(insert_batch, batch)
-                batch = []
-                batch_num += 1
-
-        # Final batch
-        if batch:
-            print(f"✔ Inserting FINAL batch {batch_num} ({len(batch)} rows)")
-            session.execute_write(insert_batch, batch)
+        create_constraints(session)
+        print("Constraints ready (Song.track_id, Artist.name, Genre.name)")
+
+        if args.apoc:
+            load_with_apoc(session, collection, total_rows)
+        else:
+            load_with_transactions(session, collection, total_rows)
 
     print("\n🎉 EXTENDED GRAPH LOADED SUCCESSFULLY")
     print("=" * 80)
@@ -10,9 +10,7 @@ Este archivo cumple con:
 ✔ Separación clara de extracción desde MongoDB y desde Neo4j.
 """
 
-from neo4j import GraphDatabase
-from pymongo import MongoClient
-from config import NEO4J_CONFIG, MONGODB_CONFIG
+from config import MONGODB_CONFIG, get_mongo_client, get_neo4j_driver
 
 
 # ============================================================
@@ -20,22 +18,24 @@ from config import NEO4J_CONFIG, MONGODB_CONFIG
 # ============================================================
 
 def connect_mongodb():
-    client = MongoClient(MONGODB_CONFIG["uri"])
+    client = get_mongo_client()
     db = client[MONGODB_CONFIG["database"]]
     return client, db
 
 
 def connect_neo4j():
-    return GraphDatabase.driver(
-        NEO4J_CONFIG["uri"],
-        auth=(NEO4J_CONFIG["user"], NEO4J_CONFIG["password"])
-    )
+    return get_neo4j_driver()
 
 
 # ============================================================
 #  UTILIDAD PARA MOSTRAR CONSULTAS
 # ============================================================
 
+def index_hint(indexes, index_name):
+    """Devuelve el nombre del índice si está en `indexes`; si no, None (sin hint)."""
+    return index_name if index_name in indexes else None
+
+
 def print_title(title):
     print("\n" + "="*90)
     print(title)
@@ -52,9 +52,20 @@ def run_mongodb_queries():
 
     print_title("A) CONSULTAS A MONGODB")
 
-    # 1) Canciones más populares
+    # Índices existentes, consultados una sola vez para A1 y A2
+    indexes = tracks.index_information()
+
+    # 1) Canciones más populares: consulta cubierta por el índice
+    # popularity_name_artist (las ramas de $facet no pueden usar índices).
+    # Bases cargadas antes de crear ese índice se consultan sin hint.
     print_title("A1) Top 10 canciones más populares")
-    for x in tracks.find().sort("popularity", -1).limit(10):
+    top_popular = (
+        tracks.find({}, {"_id": 0, "track_name": 1, "popularity": 1, "artists": 1})
+        .sort("popularity", -1)
+        .hint(index_hint(indexes, "popularity_name_artist"))
+        .limit(10)
+    )
+    for x in top_popular:
         print(f"{x['track_name']} ({x['popularity']}) – {x['artists']}")
 
     # 2) Energía promedio por género
@@ -64,31 +75,44 @@ def run_mongodb_queries():
         {"$sort": {"energia_promedio": -1}},
         {"$limit": 10}
     ]
-    for x in tracks.aggregate(pipeline):
+    # Con genre_energy, un $sort inicial por track_genre permite agrupar
+    # leyendo solo el índice; sin él, ese $sort sería un ordenamiento completo.
+    # aggregate() no acepta hint=None: solo se pasa si el índice existe
+    options = {"allowDiskUse": True}
+    if index_hint(indexes, "genre_energy"):
+        pipeline.insert(0, {"$sort": {"track_genre": 1}})
+        options["hint"] = "genre_energy"
+    energy_by_genre = tracks.aggregate(pipeline, **options)
+    for x in energy_by_genre:
         print(x)
 
-    # 3) Conteo de canciones por artista
-    print_title("A3) Artistas con más canciones (MongoDB)")
+    # A3 y A4 en un solo $facet: una pasada sobre la colección
     pipeline = [
-        {"$group": {"_id": "$artists", "total": {"$sum": 1}}},
-        {"$sort": {"total": -1}},
-        {"$limit": 10}
+        {"$facet": {
+            # 3) Conteo de canciones por artista
+            "top_artists": [
+                {"$group": {"_id": "$artists", "total": {"$sum": 1}}},
+                {"$sort": {"total": -1}},
+                {"$limit": 10}
+            ],
+            # 4) Géneros más frecuentes
+            "top_genres": [
+                {"$group": {"_id": "$track_genre", "total": {"$sum": 1}}},
+                {"$sort": {"total": -1}},
+                {"$limit": 10}
+            ],
+        }}
     ]
-    for x in tracks.aggregate(pipeline):
+    results = next(tracks.aggregate(pipeline, allowDiskUse=True))
+
+    print_title("A3) Artistas con más canciones (MongoDB)")
+    for x in results["top_artists"]:
         print(x)
 
-    # 4) Géneros más frecuentes
     print_title("A4) Géneros con más canciones (MongoDB)")
-    pipeline = [
-        {"$group": {"_id": "$track_genre", "total": {"$sum": 1}}},
-        {"$sort": {"total": -1}},
-        {"$limit": 10}
-    ]
-    for x in tracks.aggregate(pipeline):
+    for x in results["top_genres"]:
         print(x)
 
-    client.close()
-
 
 # ============================================================
 #  SECCIÓN B: CONSULTAS NEO4J
@@ -159,8 +183,6 @@ def run_neo4j_queries():
         for r in result:
             print(r)
 
-    driver.close()
-
 
 # ============================================================
 #  MAIN
@@ -170,6 +192,10 @@ def main():
     print_title("03 — EXTRACCIÓN DE INFORMACIÓN DESDE AMBAS BASES")
     run_mongodb_queries()
     run_neo4j_queries()
+
+    # Clientes compartidos (config): se cierran una sola vez al final
+    get_mongo_client().close()
+    get_neo4j_driver().close()
     print_title("FIN DE LA EXTRACCIÓN DE INFORMACIÓN")
 
 
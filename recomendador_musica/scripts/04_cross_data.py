@@ -5,11 +5,21 @@ Cruza información entre MongoDB (atributos musicales) y Neo4J (relaciones).
 Genera una recomendación híbrida basada en:
 - Géneros compartidos
 - Popularidad de canciones
+
+La popularidad de MongoDB se copia a (:Song).popularity durante la carga
+(02_load_neo4j.py), así la recomendación completa se resuelve en una sola
+consulta a Neo4J, sin un segundo viaje a MongoDB.
+
+Uso:
+    python 04_cross_data.py [--profile]
+
+--profile muestra el plan (PROFILE) de la consulta a Neo4J para verificar
+que el artista se busca con NodeUniqueIndexSeek y no con un label scan.
 """
 
-from neo4j import GraphDatabase
-from pymongo import MongoClient
-from config import NEO4J_CONFIG, MONGODB_CONFIG
+import argparse
+
+from config import get_neo4j_driver
 
 
 # ============================================================
@@ -17,99 +27,103 @@ from config import NEO4J_CONFIG, MONGODB_CONFIG
 # ============================================================
 
 def connect_neo4j():
-    return GraphDatabase.driver(
-        NEO4J_CONFIG["uri"],
-        auth=(NEO4J_CONFIG["user"], NEO4J_CONFIG["password"])
-    )
-
-def connect_mongodb():
-    client = MongoClient(MONGODB_CONFIG["uri"])
-    db = client[MONGODB_CONFIG["database"]]
-    return client, db
+    return get_neo4j_driver()
 
 
 # ============================================================
 # CONSULTAS A NEO4J
 # ============================================================
 
-def get_similar_artists(driver, artist_name):
+# Texto constante y parametrizado: Neo4J reutiliza el plan en caché.
+# Devuelve en una sola fila los artistas similares y sus canciones más populares.
+RECOMMENDATION_QUERY = """
+MATCH (a:Artist {name: $artist})-[:PLAYS_GENRE]->(g:Genre)
+MATCH (other:Artist)-[:PLAYS_GENRE]->(g)
+WHERE other <> a
+WITH other, COLLECT(DISTINCT g.name) AS shared_genres
+ORDER BY SIZE(shared_genres) DESC
+LIMIT 20
+WITH COLLECT({artist: other.name, genres: shared_genres, matches: SIZE(shared_genres)}) AS similar,
+     COLLECT(other) AS others
+CALL {
+    WITH others
+    UNWIND others AS other
+    MATCH (other)<-[:BY_ARTIST]-(s:Song)
+    WITH DISTINCT s
+    // Grafos cargados sin popularidad tienen null: se ordenan al final
+    ORDER BY coalesce(s.popularity, -1) DESC
+    LIMIT 15
+    MATCH (s)-[:BY_ARTIST]->(artist:Artist)
+    WITH s, COLLECT(artist.name) AS artists
+    ORDER BY coalesce(s.popularity, -1) DESC
+    RETURN COLLECT({track_name: s.track_name, artists: artists, popularity: s.popularity}) AS songs
+}
+RETURN similar, songs;
+"""
+
+
+def get_recommendations(session, artist_name):
     """
-    Devuelve artistas que comparten géneros con el artista base.
-    Añade: géneros compartidos y número de coincidencias.
+    Devuelve (artistas_similares, canciones) para el artista base.
+    - artistas_similares: artistas que comparten géneros, con los géneros
+      compartidos y el número de coincidencias.
+    - canciones: las 15 canciones más populares de esos artistas.
+    Recibe una sesión abierta para reutilizarla entre recomendaciones.
     """
 
-    query = """
-    MATCH (a:Artist {name: $artist})-[:PLAYS_GENRE]->(g:Genre)
-    MATCH (other:Artist)-[:PLAYS_GENRE]->(g)
-    WHERE other <> a
-    WITH other, COLLECT(DISTINCT g.name) AS shared_genres
-    RETURN other.name AS artist,
-           shared_genres AS genres,
-           SIZE(shared_genres) AS matches
-    ORDER BY matches DESC
-    LIMIT 20;
-    """
+    record = session.run(RECOMMENDATION_QUERY, artist=artist_name).single()
+    if record is None:
+        return [], []
+    return record["similar"], record["songs"]
 
-    with driver.session() as session:
-        result = session.run(query, artist=artist_name)
-        return [
-            {
-                "artist": record["artist"],
-                "genres": record["genres"],
-                "matches": record["matches"]
-            }
-            for record in result
-        ]
 
+def print_query_plan(session, query, **params):
+    """Ejecuta la consulta con PROFILE y muestra los operadores del plan."""
 
-# ============================================================
-# CONSULTAS A MONGODB
-# ============================================================
+    summary = session.run("PROFILE " + query, **params).consume()
 
-def get_top_songs_for_artists(db, artists_list):
-    """
-    Obtiene canciones populares desde MongoDB para los artistas recomendados.
-    """
+    def walk(plan, depth=0):
+        print(f"{'  ' * depth}{plan['operatorType']} (db hits: {plan.get('dbHits', 0)})")
+        for child in plan.get("children", []):
+            walk(child, depth + 1)
 
-    pipeline = [
-        {"$match": {"artists": {"$in": artists_list}}},
-        {"$sort": {"popularity": -1}},
-        {"$limit": 15},
-        {
-            "$project": {
-                "track_name": 1,
-                "artists": 1,
-                "popularity": 1,
-                "track_genre": 1,
-                "_id": 0
-            }
-        }
-    ]
-
-    return list(db.tracks.aggregate(pipeline))
+    print("\nPlan de ejecución (PROFILE):")
+    print("--------------------------------------------------------------------")
+    walk(summary.profile)
 
 
 # ============================================================
 # FLUJO PRINCIPAL
 # ============================================================
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Recomendación híbrida (Neo4J)")
+    parser.add_argument("--profile", action="store_true",
+                        help="muestra el plan de ejecución de la consulta a Neo4J")
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
 
     print("=" * 80)
-    print("RECOMENDACIÓN HÍBRIDA (MongoDB + Neo4J)")
+    print("RECOMENDACIÓN HÍBRIDA (Neo4J)")
     print("=" * 80)
 
-    # --- conexiones ---
+    # --- conexión ---
     neo = connect_neo4j()
-    mongo_client, mongo_db = connect_mongodb()
 
     # --- input del usuario ---
     artista_base = input("\nIngresa un artista para generar recomendaciones: ").strip()
 
-    print("\nBuscando artistas similares en Neo4J...")
+    print("\nBuscando artistas similares y canciones en Neo4J...")
 
-    # --- obtener artistas similares ---
-    similar_artists = get_similar_artists(neo, artista_base)
+    # --- obtener artistas similares y canciones recomendadas ---
+    with neo.session() as session:
+        if args.profile:
+            print_query_plan(session, RECOMMENDATION_QUERY, artist=artista_base)
+
+        similar_artists, songs = get_recommendations(session, artista_base)
 
     if not similar_artists:
         print("\n⚠ No se encontraron artistas similares.")
@@ -129,21 +143,17 @@ def main():
 
         print(f"{artista} — comparte {count} género(s): {generos}")
 
-    # --- obtener canciones recomendadas desde MongoDB ---
-    artists_only = [item["artist"] for item in similar_artists]
-    songs = get_top_songs_for_artists(mongo_db, artists_only)
-
-    print("\n\nCanciones recomendadas (MongoDB + Neo4J):")
+    print("\n\nCanciones recomendadas (Neo4J):")
     print("--------------------------------------------------------------------")
 
     if not songs:
-        print("⚠ No se encontraron canciones en MongoDB para estos artistas.")
+        print("⚠ No se encontraron canciones para estos artistas.")
     else:
         for s in songs:
-            print(f"{s['track_name']} — {s['artists']} (Popularidad: {s['popularity']})")
+            artistas = ", ".join(s["artists"])
+            print(f"{s['track_name']} — {artistas} (Popularidad: {s['popularity']})")
 
-    # cerrar conexiones
-    mongo_client.close()
+    # cerrar conexión
     neo.close()
 
 